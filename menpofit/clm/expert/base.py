@@ -3,6 +3,85 @@ import numpy as np
 from menpofit.math.correlationfilter import mccf, imccf
 
 
+def _ensure_dtype(X, dtype):
+    r"""
+    Casts the provided `ndarray` (or `scipy.sparse` matrix) to the given
+    dtype, avoiding the copy if it already has that dtype.
+
+    Parameters
+    ----------
+    X : `ndarray` or `scipy.sparse.spmatrix`
+        The array.
+    dtype : `numpy.dtype`
+        The desired dtype.
+
+    Returns
+    -------
+    X : `ndarray` or `scipy.sparse.spmatrix`
+        The array with the desired dtype.
+    """
+    if X.dtype == dtype:
+        return X
+    return X.astype(dtype)
+
+
+def _stack_patches(patches, dtype=np.float32):
+    r"""
+    Stacks a `list` of patches into a single preallocated `ndarray`, copying
+    (and casting) each patch exactly once.
+
+    Parameters
+    ----------
+    patches : `list` of ``(n_channels, patch_h, patch_w)`` `ndarray`
+        The patches.
+    dtype : `numpy.dtype`, optional
+        The dtype of the stacked patches.
+
+    Returns
+    -------
+    stacked_patches : ``(n_images, n_channels, patch_h, patch_w)`` `ndarray`
+        The C-contiguous stack of patches.
+
+    Raises
+    ------
+    ValueError
+        All the patches must have the same shape
+    """
+    patch_shape = patches[0].shape
+    stacked_patches = np.empty((len(patches),) + patch_shape, dtype=dtype)
+    for i, patch in enumerate(patches):
+        if patch.shape != patch_shape:
+            raise ValueError('All the patches must have the same shape; '
+                             'patch {} has shape {} instead of {}'.format(
+                                 i, patch.shape, patch_shape))
+        np.copyto(stacked_patches[i], patch)
+    return stacked_patches
+
+
+def _as_c_contig_f32(X):
+    r"""
+    Returns the provided patches as a C-contiguous ``float32`` `ndarray`. If
+    they already are one, they are returned as they are, without any copy.
+
+    Parameters
+    ----------
+    X : `list` or ``(n_images, n_channels, patch_h, patch_w)`` `ndarray`
+        The patches. If `list`, then it consists of `n_images`
+        ``(n_channels, patch_h, patch_w)`` `ndarray` members.
+
+    Returns
+    -------
+    X : ``(n_images, n_channels, patch_h, patch_w)`` `ndarray`
+        The C-contiguous ``float32`` patches.
+    """
+    if X.__class__ is np.ndarray:
+        if X.flags.c_contiguous and X.dtype == np.float32:
+            return X
+    elif isinstance(X, list):
+        return _stack_patches(X)
+    return np.ascontiguousarray(X, dtype=np.float32)
+
+
 class IncrementalCorrelationFilterThinWrapper(object):
     r"""
     Wrapper class for defining an Incremental Correlation Filter.
@@ -27,6 +106,21 @@ class IncrementalCorrelationFilterThinWrapper(object):
         :map:`imccf`  Incremental Multi-Channel Correlation Filter
         :map:`imosse` Incremental Minimum Output Sum of Squared Errors Filter
         ============= =======================================================
+
+    Notes
+    -----
+    The training patches and the desired response are always handed to the
+    callables as ``float32`` arrays. Integer (e.g. ``uint8``) patches are
+    promoted within the single copy that stacks them, so there is never an
+    intermediate ``float64`` copy of the patches. Both `train` and
+    `increment` return the auto-correlation array as ``complex128`` and the
+    cross-correlation array, which is by far the largest quantity that is
+    kept between increments, as ``complex64``, regardless of the precision
+    the callables computed them in. The default incremental callables
+    (:map:`imccf`, :map:`imosse`) perform the update and the solve in double
+    precision, whereas the default callables of `train` (:map:`mccf`,
+    :map:`mosse`) operate on the ``float32`` data as given, hence their
+    spectra and solve may be in single precision (e.g. with pyfftw).
     """
     def __init__(self, cf_callable=mccf, icf_callable=imccf):
         self.cf_callable = cf_callable
@@ -49,6 +143,9 @@ class IncrementalCorrelationFilterThinWrapper(object):
         Z : `list` or ``(n_images, n_channels, patch_h, patch_w)`` `ndarray`
             The training images (patches). If `list`, then it consists of
             `n_images` ``(n_channels, patch_h, patch_w)`` `ndarray` members.
+            Patches of any real dtype (e.g. ``uint8`` pixels) are accepted
+            and promoted to ``float32`` while being copied, without any
+            rescaling of their values.
         t : ``(1, response_h, response_w)`` `ndarray`
             The desired response.
 
@@ -63,10 +160,14 @@ class IncrementalCorrelationFilterThinWrapper(object):
             The cross-correlation array, where
             ``N = (patch_h+response_h-1) * (patch_w+response_w-1) * n_channels``
         """
-        # Turn list of X into ndarray
-        if isinstance(Z, list):
-            Z = np.asarray(Z)
-        return self.icf_callable(A, B, n_x, Z, t)
+        # Turn list of Z into a float32 ndarray (no-op if it already is one)
+        Z = _as_c_contig_f32(Z)
+        t = _as_c_contig_f32(t)
+        # Return filter, (double precision) auto-correlation and (single
+        # precision) cross-correlation
+        f, A, B = self.icf_callable(A, B, n_x, Z, t)
+        return (f, _ensure_dtype(A, np.complex128),
+                _ensure_dtype(B, np.complex64))
 
     def train(self, X, t):
         r"""
@@ -77,6 +178,9 @@ class IncrementalCorrelationFilterThinWrapper(object):
         X : `list` or ``(n_images, n_channels, patch_h, patch_w)`` `ndarray`
             The training images (patches). If `list`, then it consists of
             `n_images` ``(n_channels, patch_h, patch_w)`` `ndarray` members.
+            Patches of any real dtype (e.g. ``uint8`` pixels) are accepted
+            and promoted to ``float32`` while being copied, without any
+            rescaling of their values.
         t : ``(1, response_h, response_w)`` `ndarray`
             The desired response.
 
@@ -91,8 +195,11 @@ class IncrementalCorrelationFilterThinWrapper(object):
             The cross-correlation array, where
             ``N = (patch_h+response_h-1) * (patch_w+response_w-1) * n_channels``
         """
-        # Turn list of X into ndarray
-        if isinstance(X, list):
-            X = np.asarray(X)
-        # Return linear svm filter and bias
-        return self.cf_callable(X, t)
+        # Turn list of X into a float32 ndarray (no-op if it already is one)
+        X = _as_c_contig_f32(X)
+        t = _as_c_contig_f32(t)
+        # Return filter, (double precision) auto-correlation and (single
+        # precision) cross-correlation
+        f, A, B = self.cf_callable(X, t)
+        return (f, _ensure_dtype(A, np.complex128),
+                _ensure_dtype(B, np.complex64))
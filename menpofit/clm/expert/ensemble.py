@@ -10,7 +10,7 @@ from menpo.base import name_of_callable
 from menpofit.base import build_grid
 from menpofit.feature import normalize_norm, probability_map
 from menpofit.math.fft_utils import (fft2, ifft2, fftshift, pad, crop,
-                                     fft_convolve2d_sum)
+                                     fft_convolve2d_sum, fft_plan_cache)
 from menpofit.visualize import print_progress
 
 from .base import IncrementalCorrelationFilterThinWrapper
@@ -145,8 +145,10 @@ class ConvolutionBasedExpertEnsemble(ExpertEnsemble):
             If ``True``, then information about the training progress will be
             printed.
         """
-        self._train(images, shapes, prefix=prefix, verbose=verbose,
-                    increment=True)
+        # All experts share the same fft shapes, so reuse the FFTW plans
+        with fft_plan_cache():
+            self._train(images, shapes, prefix=prefix, verbose=verbose,
+                        increment=True)
 
     @property
     def spatial_filter_images(self):
@@ -341,8 +343,10 @@ class CorrelationFilterExpertEnsemble(ConvolutionBasedExpertEnsemble):
         self.response = generate_gaussian_response(
             self.patch_shape, self.response_covariance)[None, ...]
 
-        # Train ensemble of correlation filter experts
-        self._train(images, shapes, verbose=verbose, prefix=prefix)
+        # Train ensemble of correlation filter experts, reusing the FFTW plans
+        # since all experts share the same fft shapes
+        with fft_plan_cache():
+            self._train(images, shapes, verbose=verbose, prefix=prefix)
 
     def _extract_patch(self, image, landmark):
         # Extract patch from image
@@ -384,7 +388,7 @@ class CorrelationFilterExpertEnsemble(ConvolutionBasedExpertEnsemble):
         n_experts = shapes[0].n_points
 
         # Train ensemble of correlation filter experts
-        fft_padded_filters = []
+        correlation_filters = []
         auto_correlations = []
         cross_correlations = []
         for i in wrap(range(n_experts)):
@@ -410,17 +414,16 @@ class CorrelationFilterExpertEnsemble(ConvolutionBasedExpertEnsemble):
                 correlation_filter, auto_correlation, cross_correlation = (
                     self._icf.train(patches, self.response))
 
-            # Pad filter with zeros
-            padded_filter = pad(correlation_filter, self.padded_size)
-            # Compute fft of padded filter
-            fft_padded_filter = fft2(padded_filter)
-            # Add fft padded filter to list
-            fft_padded_filters.append(fft_padded_filter)
+            # Add filter to list
+            correlation_filters.append(correlation_filter)
             auto_correlations.append(auto_correlation)
             cross_correlations.append(cross_correlation)
 
-        # Turn list into ndarray
-        self.fft_padded_filters = np.asarray(fft_padded_filters)
+        # Pad all filters with zeros
+        padded_filters = pad(np.asarray(correlation_filters), self.padded_size)
+        # Compute the ffts of all padded filters at once
+        self.fft_padded_filters = fft2(padded_filters)
+        # Turn lists into ndarray
         self.auto_correlations = np.asarray(auto_correlations)
         self.cross_correlations = np.asarray(cross_correlations)
 
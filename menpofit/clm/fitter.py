@@ -1,3 +1,7 @@
+from hashlib import sha1
+from weakref import WeakKeyDictionary, WeakValueDictionary
+import numpy as np
+
 from menpofit.fitter import MultiScaleParametricFitter
 from menpofit import checks
 
@@ -101,35 +105,58 @@ class GradientDescentCLMFitter(CLMFitter):
         components may have already been trimmed to `max_shape_components`
         during training.
     """
+    # Algorithm objects that are currently alive, keyed by the ids of their
+    # expert ensemble and shape model and by their class, so that fitters
+    # constructed over the same CLM share them instead of re-computing them.
+    # The fingerprint of the models each cached algorithm was precomputed
+    # from is kept alongside it and checked on every hit, since the models
+    # can be modified in-place (e.g. by CLM.increment).
+    _algo_cache = WeakValueDictionary()
+    _algo_fingerprints = WeakKeyDictionary()
+
     def __init__(self, clm, gd_algorithm_cls=RegularisedLandmarkMeanShift,
                  n_shape=None):
-        # Store CLM trained model
-        self._model = clm
-
         # Check parameter
         checks.set_models_components(clm.shape_models, n_shape)
 
         # Get list of algorithm objects per scale
-        algorithms = [gd_algorithm_cls(clm.expert_ensembles[i],
-                                       clm.shape_models[i])
+        algorithms = [self._cached_algorithm(gd_algorithm_cls,
+                                             clm.expert_ensembles[i],
+                                             clm.shape_models[i])
                       for i in range(clm.n_scales)]
 
         # Call superclass
         super(GradientDescentCLMFitter, self).__init__(clm=clm,
                                                        algorithms=algorithms)
 
+    @classmethod
+    def _cached_algorithm(cls, gd_algorithm_cls, expert_ensemble,
+                          shape_model):
+        r"""
+        Returns the cached algorithm object for the provided expert ensemble
+        and shape model, if the models have not changed since it was
+        constructed, or constructs (and caches) a new one.
+        """
+        key = (id(expert_ensemble), id(shape_model), gd_algorithm_cls)
+        fingerprint = _models_fingerprint(expert_ensemble, shape_model)
+        algorithm = cls._algo_cache.get(key)
+        if (algorithm is None or
+                cls._algo_fingerprints.get(algorithm) != fingerprint):
+            algorithm = gd_algorithm_cls(expert_ensemble, shape_model)
+            cls._algo_cache[key] = algorithm
+            cls._algo_fingerprints[algorithm] = fingerprint
+        return algorithm
+
     def __str__(self):
         # Compute scale info strings
-        scales_info = []
         lvl_str_tmplt = r"""   - Scale {}
      - {} active shape components
      - {} similarity transform components"""
-        for k, s in enumerate(self.scales):
-            scales_info.append(lvl_str_tmplt.format(
-                    s,
-                    self.clm.shape_models[k].n_active_components,
-                    self.clm.shape_models[k].n_global_parameters))
-        scales_info = '\n'.join(scales_info)
+        scales_info = '\n'.join(
+            lvl_str_tmplt.format(s,
+                                 self.clm.shape_models[k].n_active_components,
+                                 self.clm.shape_models[k].n_global_parameters)
+            for k, s in enumerate(self.scales))
 
         cls_str = r"""{class_title}
  - Scales: {scales}
@@ -138,3 +165,20 @@ class GradientDescentCLMFitter(CLMFitter):
                scales=self.scales,
                scales_info=scales_info)
         return self.clm.__str__() + cls_str
+
+
+def _models_fingerprint(expert_ensemble, shape_model):
+    r"""
+    Returns a compact fingerprint of everything the pre-computations of a
+    `GradientDescentCLMAlgorithm` depend on, i.e. the search shape of the
+    expert ensemble and the number of active and total components, noise
+    variance and a digest of the eigenvalues, components and mean of the
+    shape model.
+    """
+    model = shape_model.model
+    digest = sha1()
+    for a in (model.eigenvalues, model.components, model.mean().as_vector()):
+        digest.update(np.ascontiguousarray(a).tobytes())
+    return (tuple(expert_ensemble.search_shape),
+            shape_model.n_active_components, model.n_components,
+            float(model.noise_variance()), digest.hexdigest())
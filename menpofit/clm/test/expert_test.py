@@ -0,0 +1,67 @@
+import numpy as np
+from nose.tools import raises
+
+from menpofit.math.correlationfilter import mosse, imosse
+from menpofit.clm.expert.base import (
+    IncrementalCorrelationFilterThinWrapper, _stack_patches,
+    _as_c_contig_f32)
+
+
+def test_stack_patches():
+    patches = [np.full((3, 4, 4), i, dtype=np.uint8) for i in range(2)]
+    stacked_patches = _stack_patches(patches)
+    assert stacked_patches.shape == (2, 3, 4, 4)
+    assert stacked_patches.dtype == np.float32
+    assert np.all(stacked_patches[1] == 1)
+
+
+@raises(ValueError)
+def test_stack_patches_different_shapes_raises_value_error():
+    _stack_patches([np.zeros((3, 4, 4)), np.zeros((1, 4, 4))])
+
+
+def check_wrapper_dtypes(icf):
+    rng = np.random.RandomState(0)
+    X = [rng.randn(2, 6, 6) for _ in range(3)]
+    Z = [rng.randn(2, 6, 6) for _ in range(2)]
+    t = rng.randn(1, 6, 6)
+    _, A, B = icf.train(X, t)
+    assert A.dtype == np.complex128
+    assert B.dtype == np.complex64
+    _, A, B = icf.increment(A, B, 3, Z, t)
+    assert A.dtype == np.complex128
+    assert B.dtype == np.complex64
+
+
+def test_wrapper_dtypes_mccf():
+    check_wrapper_dtypes(IncrementalCorrelationFilterThinWrapper())
+
+
+def test_wrapper_dtypes_mosse():
+    check_wrapper_dtypes(IncrementalCorrelationFilterThinWrapper(
+        cf_callable=mosse, icf_callable=imosse))
+
+
+def test_as_c_contig_f32_returns_contiguous_float32_input():
+    X = np.zeros((2, 3, 4, 4), dtype=np.float32)
+    assert _as_c_contig_f32(X) is X
+
+
+def test_as_c_contig_f32_copies_float64_input():
+    X = np.arange(2 * 3 * 4 * 4, dtype=np.float64).reshape((2, 3, 4, 4))
+    X_f32 = _as_c_contig_f32(X)
+    assert X_f32 is not X
+    assert X_f32.dtype == np.float32
+    assert X_f32.flags.c_contiguous
+    assert np.all(X_f32 == X)
+
+
+def test_as_c_contig_f32_copies_non_contiguous_input():
+    X = np.arange(2 * 3 * 4 * 8, dtype=np.float32).reshape((2, 3, 4, 8))
+    X_view = X[..., ::2]
+    assert not X_view.flags.c_contiguous
+    X_f32 = _as_c_contig_f32(X_view)
+    assert X_f32 is not X_view
+    assert X_f32.dtype == np.float32
+    assert X_f32.flags.c_contiguous
+    assert np.all(X_f32 == X_view)
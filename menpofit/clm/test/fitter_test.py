@@ -0,0 +1,67 @@
+import numpy as np
+from numpy.testing import assert_allclose
+
+from menpo.shape import PointCloud
+from menpofit.modelinstance import OrthoPDM
+from menpofit.clm import GradientDescentCLMFitter, RegularisedLandmarkMeanShift
+
+
+class FakeExpertEnsemble(object):
+    search_shape = (5, 5)
+
+
+class FakeCLM(object):
+    def __init__(self, shapes):
+        self.scales = (1,)
+        self.n_scales = 1
+        self.reference_shape = shapes[0]
+        self.holistic_features = [None]
+        self.expert_ensembles = [FakeExpertEnsemble()]
+        self.shape_models = [OrthoPDM(shapes)]
+
+
+def random_shapes(n_shapes, seed):
+    rng = np.random.RandomState(seed)
+    base = rng.randn(10, 2) * 10
+    return [PointCloud(base + rng.randn(10, 2)) for _ in range(n_shapes)]
+
+
+def assert_algorithms_equal(algorithm, expected):
+    assert algorithm.J.shape == expected.J.shape
+    assert_allclose(algorithm.J, expected.J)
+    assert_allclose(algorithm.inv_JJ_prior, expected.inv_JJ_prior)
+    assert_allclose(algorithm.rho2, expected.rho2)
+
+
+def test_algorithm_shared_between_fitters():
+    clm = FakeCLM(random_shapes(20, 0))
+    fitter_1 = GradientDescentCLMFitter(clm)
+    fitter_2 = GradientDescentCLMFitter(clm)
+    assert fitter_2.algorithms[0] is fitter_1.algorithms[0]
+    # the fingerprint is kept by the cache, not on the algorithm
+    assert not any(name.startswith('_models')
+                   for name in vars(fitter_1.algorithms[0]))
+
+
+def test_algorithm_recomputed_after_shape_model_increment():
+    clm = FakeCLM(random_shapes(20, 0))
+    fitter_1 = GradientDescentCLMFitter(clm)
+    clm.shape_models[0].increment(random_shapes(10, 1))
+    fitter_2 = GradientDescentCLMFitter(clm)
+    assert fitter_2.algorithms[0] is not fitter_1.algorithms[0]
+    assert_algorithms_equal(
+        fitter_2.algorithms[0],
+        RegularisedLandmarkMeanShift(clm.expert_ensembles[0],
+                                     clm.shape_models[0]))
+
+
+def test_algorithm_recomputed_after_n_active_components_change():
+    clm = FakeCLM(random_shapes(20, 0))
+    fitter_1 = GradientDescentCLMFitter(clm)
+    clm.shape_models[0].n_active_components = 3
+    fitter_2 = GradientDescentCLMFitter(clm)
+    assert fitter_2.algorithms[0] is not fitter_1.algorithms[0]
+    assert_algorithms_equal(
+        fitter_2.algorithms[0],
+        RegularisedLandmarkMeanShift(clm.expert_ensembles[0],
+                                     clm.shape_models[0]))
@@ -1,9 +1,149 @@
 import numpy as np
-from numpy.fft import fft2, ifft2, ifftshift
-from scipy.sparse import spdiags, eye as speye
-from scipy.sparse.linalg import spsolve
+from scipy.sparse import coo_matrix
 
-from menpofit.math.fft_utils import pad, crop
+from menpofit.math.fft_utils import fft2, ifft2, ifftshift, pad, crop
+
+
+# Cache of the ffts of the extended desired responses. All the experts of an
+# ensemble are trained (and incremented) with the same desired response, so
+# its fft only needs to be computed once per extended shape.
+_fft_ext_y_cache = {}
+_FFT_EXT_Y_CACHE_SIZE = 32
+
+
+def _fft_ext_response(y, ext_shape):
+    r"""
+    Returns the (cached) fft of the desired response extended to the given
+    shape.
+
+    Parameters
+    ----------
+    y : ``(1, response_h, response_w)`` `ndarray`
+        The desired response.
+    ext_shape : (`int`, `int`)
+        The extended shape.
+
+    Returns
+    -------
+    fft_ext_y : ``(1, ext_h, ext_w)`` `ndarray`
+        The read-only fft of the extended desired response.
+    """
+    key = (tuple(ext_shape), y.shape, y.dtype.str, y.tobytes())
+    fft_ext_y = _fft_ext_y_cache.get(key)
+    if fft_ext_y is None:
+        if len(_fft_ext_y_cache) >= _FFT_EXT_Y_CACHE_SIZE:
+            _fft_ext_y_cache.clear()
+        fft_ext_y = fft2(pad(y, ext_shape))
+        fft_ext_y.flags.writeable = False
+        _fft_ext_y_cache[key] = fft_ext_y
+    return fft_ext_y
+
+
+def _mccf_spectral_energy(fft_ext_X, fft_ext_y):
+    r"""
+    Computes the auto and cross spectral energy of a stack of extended image
+    ffts in a single batched pass.
+
+    Parameters
+    ----------
+    fft_ext_X : ``(n_images, n_channels, ext_h * ext_w)`` `ndarray`
+        The vectorized ffts of the extended images.
+    fft_ext_y : ``(ext_h * ext_w,)`` `ndarray`
+        The vectorized fft of the extended desired response.
+
+    Returns
+    -------
+    sXY : ``(N,)`` `ndarray`
+        The auto-correlation array, where ``N = ext_h * ext_w * n_channels``.
+    sXX : ``(n_channels, n_channels, ext_h * ext_w)`` `ndarray`
+        The ``n_channels x n_channels`` block of the cross-correlation matrix
+        associated to each frequency.
+    """
+    sXX = np.einsum('nid,njd->ijd', fft_ext_X.conj(), fft_ext_X)
+    # the desired response is the same for all images, hence the cross
+    # spectral energy only needs the sum of the image ffts
+    sXY = (fft_ext_X.sum(axis=0).conj() * fft_ext_y).ravel()
+    return sXY, sXX
+
+
+def _blocks_to_sparse(blocks):
+    r"""
+    Builds the sparse ``(N, N)`` cross-correlation matrix, where
+    ``N = ext_h * ext_w * n_channels``, from its per-frequency
+    ``n_channels x n_channels`` blocks.
+
+    Parameters
+    ----------
+    blocks : ``(n_channels, n_channels, ext_h * ext_w)`` `ndarray`
+        The per-frequency blocks.
+
+    Returns
+    -------
+    sXX : ``(N, N)`` `scipy.sparse.csr_matrix`
+        The cross-correlation matrix.
+    """
+    k, _, ext_d = blocks.shape
+    c1, c2, d = np.indices(blocks.shape)
+    rows = (c1 * ext_d + d).ravel()
+    cols = (c2 * ext_d + d).ravel()
+    return coo_matrix((blocks.ravel(), (rows, cols)),
+                      shape=(k * ext_d, k * ext_d)).tocsr()
+
+
+def _sparse_to_blocks(sXX, k):
+    r"""
+    Extracts the per-frequency ``n_channels x n_channels`` blocks of a sparse
+    ``(N, N)`` cross-correlation matrix, where
+    ``N = ext_h * ext_w * n_channels``. This is the inverse of
+    :func:`_blocks_to_sparse`.
+
+    Parameters
+    ----------
+    sXX : ``(N, N)`` `scipy.sparse.spmatrix`
+        The cross-correlation matrix.
+    k : `int`
+        The number of channels.
+
+    Returns
+    -------
+    blocks : ``(n_channels, n_channels, ext_h * ext_w)`` `ndarray`
+        The per-frequency blocks.
+    """
+    ext_d = sXX.shape[-1] // k
+    c1, c2, d = np.indices((k, k, ext_d))
+    rows = (c1 * ext_d + d).ravel()
+    cols = (c2 * ext_d + d).ravel()
+    blocks = np.asarray(sXX.tocsr()[rows, cols])
+    return blocks.reshape((k, k, ext_d))
+
+
+def _solve_blocks(blocks, sXY, l):
+    r"""
+    Solves the ``ext_h * ext_w`` independent regularized
+    ``n_channels x n_channels`` linear systems that the block diagonal
+    cross-correlation matrix consists of.
+
+    Parameters
+    ----------
+    blocks : ``(n_channels, n_channels, ext_h * ext_w)`` `ndarray`
+        The per-frequency blocks of the cross-correlation matrix.
+    sXY : ``(N,)`` `ndarray`
+        The auto-correlation array, where ``N = ext_h * ext_w * n_channels``.
+    l : `float`
+        Regularization parameter.
+
+    Returns
+    -------
+    fft_ext_f : ``(N,)`` `ndarray`
+        The vectorized extended multi-channel correlation filter on the
+        frequency domain.
+    """
+    k, _, ext_d = blocks.shape
+    # (ext_d, k, k) stack of regularized systems
+    systems = blocks.transpose((2, 0, 1)) + l * np.eye(k)
+    # (ext_d, k, 1) stack of right hand sides
+    rhs = sXY.reshape((k, ext_d)).T[..., None]
+    return np.linalg.solve(systems, rhs)[..., 0].T.ravel()
 
 
 def mosse(X, y, l=0.01, boundary='constant', crop_filter=True):
@@ -56,24 +196,19 @@ def mosse(X, y, l=0.01, boundary='constant', crop_filter=True):
     ext_w = wx + wy - 1
     ext_shape = (ext_h, ext_w)
 
-    # extend desired response
-    ext_y = pad(y, ext_shape)
     # fft of extended desired response
-    fft_ext_y = fft2(ext_y)
+    fft_ext_y = _fft_ext_response(y, ext_shape)
+
+    # extend images
+    ext_X = pad(X, ext_shape, boundary=boundary)
+    # fft of all extended images at once
+    fft_ext_X = fft2(ext_X)
 
     # auto and cross spectral energy matrices
-    sXX = 0
-    sXY = 0
-    # for each training image and desired response
-    for x in X:
-        # extend image
-        ext_x = pad(x, ext_shape, boundary=boundary)
-        # fft of extended image
-        fft_ext_x = fft2(ext_x)
-
-        # update auto and cross spectral energy matrices
-        sXX += fft_ext_x.conj() * fft_ext_x
-        sXY += fft_ext_x.conj() * fft_ext_y
+    sXX = np.sum(fft_ext_X.conj() * fft_ext_X, axis=0)
+    # the desired response is the same for all images, hence the cross
+    # spectral energy only needs the sum of the image ffts
+    sXY = fft_ext_X.sum(axis=0).conj() * fft_ext_y
 
     # compute desired correlation filter
     fft_ext_f = sXY / (sXX + l)
@@ -141,6 +276,11 @@ def imosse(A, B, n_ab, X, y, l=0.01, boundary='constant',
         of International Conference on Computer Vision and Pattern Recognition
         (CVPR), 2010.
     """
+    # the update of the auto and cross spectral energy matrices and the
+    # solve are always performed in double precision
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
     # number of images; number of channels, height and width
     n_x, k, hz, wz = X.shape
 
@@ -162,29 +302,25 @@ def imosse(A, B, n_ab, X, y, l=0.01, boundary='constant',
     ext_w = wz + wy - 1
     ext_shape = (ext_h, ext_w)
 
-    # extend desired response
-    ext_y = pad(y, ext_shape)
     # fft of extended desired response
-    fft_ext_y = fft2(ext_y)
+    fft_ext_y = _fft_ext_response(y, ext_shape)
 
     # extend images
     ext_X = pad(X, ext_shape, boundary=boundary)
+    # fft of all extended images at once
+    fft_ext_X = fft2(ext_X)
 
     # auto and cross spectral energy matrices
-    sXX = 0
-    sXY = 0
-    # for each training image and desired response
-    for ext_x in ext_X:
-        # fft of extended image
-        fft_ext_x = fft2(ext_x)
-
-        # update auto and cross spectral energy matrices
-        sXX += fft_ext_x.conj() * fft_ext_x
-        sXY += fft_ext_x.conj() * fft_ext_y
-
-    # combine old and new auto and cross spectral energy matrices
-    sXY = nu_ab * A + nu_x * sXY
-    sXX = nu_ab * B + nu_x * sXX
+    sXX = np.sum(fft_ext_X.conj() * fft_ext_X, axis=0)
+    # the desired response is the same for all images, hence the cross
+    # spectral energy only needs the sum of the image ffts
+    sXY = fft_ext_X.sum(axis=0).conj() * fft_ext_y
+
+    # combine old and new auto and cross spectral energy matrices in-place
+    sXY *= nu_x
+    sXY += nu_ab * A
+    sXX *= nu_x
+    sXX += nu_ab * B
     # compute desired correlation filter
     fft_ext_f = sXY / (sXX + l)
     # reshape extended filter to extended image shape
@@ -251,35 +387,22 @@ def mccf(X, y, l=0.01, boundary='constant', crop_filter=True):
     # extended dimensionality
     ext_d = ext_h * ext_w
 
-    # extend desired response
-    ext_y = pad(y, ext_shape)
     # fft of extended desired response
-    fft_ext_y = fft2(ext_y)
+    fft_ext_y = _fft_ext_response(y, ext_shape)
 
     # extend images
     ext_X = pad(X, ext_shape, boundary=boundary)
+    # fft of all extended images at once
+    fft_ext_X = fft2(ext_X).reshape((n, k, ext_d))
 
     # auto and cross spectral energy matrices
-    sXX = 0
-    sXY = 0
-    # for each training image and desired response
-    for ext_x in ext_X:
-        # fft of extended image
-        fft_ext_x = fft2(ext_x)
-
-        # store extended image fft as sparse diagonal matrix
-        diag_fft_x = spdiags(fft_ext_x.reshape((k, -1)),
-                             -np.arange(0, k) * ext_d, ext_d * k, ext_d).T
-        # vectorize extended desired response fft
-        diag_fft_y = fft_ext_y.ravel()
-
-        # update auto and cross spectral energy matrices
-        sXX += diag_fft_x.conj().T.dot(diag_fft_x)
-        sXY += diag_fft_x.conj().T.dot(diag_fft_y)
+    sXY, sXX = _mccf_spectral_energy(fft_ext_X, fft_ext_y.ravel())
 
     # solve ext_d independent k x k linear systems (with regularization)
     # to obtain desired extended multi-channel correlation filter
-    fft_ext_f = spsolve(sXX + l * speye(sXX.shape[-1]), sXY)
+    fft_ext_f = _solve_blocks(sXX, sXY, l)
+    # store cross spectral energy as sparse block diagonal matrix
+    sXX = _blocks_to_sparse(sXX)
     # reshape extended filter to extended image shape
     fft_ext_f = fft_ext_f.reshape((k, ext_h, ext_w))
 
@@ -347,6 +470,11 @@ def imccf(A, B, n_ab, X, y, l=0.01, boundary='constant', crop_filter=True,
         Correlation Filters". IEEE Proceedings of International Conference on
         Computer Vision (ICCV), 2013.
     """
+    # the update of the auto and cross spectral energy matrices and the
+    # solve are always performed in double precision
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
     # number of images; number of channels, height and width
     n_x, k, hz, wz = X.shape
 
@@ -370,38 +498,28 @@ def imccf(A, B, n_ab, X, y, l=0.01, boundary='constant', crop_filter=True,
     # extended dimensionality
     ext_d = ext_h * ext_w
 
-    # extend desired response
-    ext_y = pad(y, ext_shape)
     # fft of extended desired response
-    fft_ext_y = fft2(ext_y)
+    fft_ext_y = _fft_ext_response(y, ext_shape)
 
     # extend images
     ext_X = pad(X, ext_shape, boundary=boundary)
+    # fft of all extended images at once
+    fft_ext_X = fft2(ext_X).reshape((n_x, k, ext_d))
 
     # auto and cross spectral energy matrices
-    sXX = 0
-    sXY = 0
-    # for each training image and desired response
-    for ext_x in ext_X:
-        # fft of extended image
-        fft_ext_x = fft2(ext_x)
-
-        # store extended image fft as sparse diagonal matrix
-        diag_fft_x = spdiags(fft_ext_x.reshape((k, -1)),
-                             -np.arange(0, k) * ext_d, ext_d * k, ext_d).T
-        # vectorize extended desired response fft
-        diag_fft_y = fft_ext_y.ravel()
-
-        # update auto and cross spectral energy matrices
-        sXX += diag_fft_x.conj().T.dot(diag_fft_x)
-        sXY += diag_fft_x.conj().T.dot(diag_fft_y)
-
-    # combine old and new auto and cross spectral energy matrices
-    sXY = nu_ab * A + nu_x * sXY
-    sXX = nu_ab * B + nu_x * sXX
+    sXY, sXX = _mccf_spectral_energy(fft_ext_X, fft_ext_y.ravel())
+
+    # combine old and new auto and cross spectral energy matrices, scaling
+    # the new terms in-place before they are added to the old ones
+    sXY *= nu_x
+    sXY += nu_ab * A
+    sXX *= nu_x
+    sXX += nu_ab * _sparse_to_blocks(B, k)
     # solve ext_d independent k x k linear systems (with regularization)
     # to obtain desired extended multi-channel correlation filter
-    fft_ext_f = spsolve(sXX + l * speye(sXX.shape[-1]), sXY)
+    fft_ext_f = _solve_blocks(sXX, sXY, l)
+    # store cross spectral energy as sparse block diagonal matrix
+    sXX = _blocks_to_sparse(sXX)
     # reshape extended filter to extended image shape
     fft_ext_f = fft_ext_f.reshape((k, ext_h, ext_w))
 
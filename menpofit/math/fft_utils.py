@@ -1,6 +1,7 @@
 from __future__ import division
 import warnings
 import numpy as np
+from contextlib import contextmanager
 from functools import wraps
 
 from menpo.feature.base import rebuild_feature_image
@@ -8,6 +9,7 @@ from menpo.feature.base import rebuild_feature_image
 try:
     # try importing pyfftw
     from pyfftw.interfaces.numpy_fft import fft2, ifft2, fftshift, ifftshift
+    from pyfftw.interfaces import cache as pyfftw_cache
 
     try:
         # try calling fft2 on a 4-dimensional array (this is known to have
@@ -19,6 +21,7 @@ try:
                       "using ffts will be running at a slower speed.",
                       RuntimeWarning)
         from numpy.fft import fft2, ifft2, fftshift, ifftshift
+        pyfftw_cache = None
 except ImportError:
     warnings.warn("pyfftw is not installed on your system, numpy.fft will be "
                   "used instead. Consequently, all algorithms using ffts "
@@ -26,6 +29,57 @@ except ImportError:
                   "pyfftw (pip install pyfftw) to speed up your ffts.",
                   ImportWarning)
     from numpy.fft import fft2, ifft2, fftshift, ifftshift
+    pyfftw_cache = None
+
+
+def enable_fft_plan_cache(keepalive_time=30):
+    r"""
+    Enables the caching of the FFTW plans of pyfftw, so that all the ffts of
+    the same shape and dtype (e.g. those of all the experts of a scale) reuse
+    a single plan instead of re-planning on every call. Note that this
+    affects all the users of the pyfftw interfaces within the process. If
+    pyfftw is not used, then this function has no effect.
+
+    Parameters
+    ----------
+    keepalive_time : `float`, optional
+        The number of seconds for which an unused plan is kept alive.
+    """
+    if pyfftw_cache is not None:
+        pyfftw_cache.enable()
+        pyfftw_cache.set_keepalive_time(keepalive_time)
+
+
+def disable_fft_plan_cache():
+    r"""
+    Disables the caching of the FFTW plans of pyfftw and clears the cache. If
+    pyfftw is not used, then this function has no effect.
+    """
+    if pyfftw_cache is not None:
+        pyfftw_cache.disable()
+
+
+@contextmanager
+def fft_plan_cache(keepalive_time=30):
+    r"""
+    Context manager that enables the caching of the FFTW plans of pyfftw
+    (see :func:`enable_fft_plan_cache`) for the duration of the context. If
+    the cache was disabled before entering the context, then it gets disabled
+    again on exit.
+
+    Parameters
+    ----------
+    keepalive_time : `float`, optional
+        The number of seconds for which an unused plan is kept alive.
+    """
+    was_enabled = pyfftw_cache is not None and pyfftw_cache.is_enabled()
+    if not was_enabled:
+        enable_fft_plan_cache(keepalive_time=keepalive_time)
+    try:
+        yield
+    finally:
+        if not was_enabled:
+            disable_fft_plan_cache()
 
 
 # TODO: Document me!
@@ -0,0 +1,175 @@
+import numpy as np
+from numpy.fft import fft2, ifft2, ifftshift
+from numpy.testing import assert_allclose
+from scipy.sparse import spdiags, eye as speye
+from scipy.sparse.linalg import spsolve
+
+from menpofit.math.fft_utils import pad, crop
+import menpofit.math.correlationfilter as cf
+from menpofit.math.correlationfilter import (mccf, imccf, mosse, imosse,
+                                             _blocks_to_sparse,
+                                             _sparse_to_blocks)
+
+
+def random_problem(n_images=5, n_channels=3, seed=0):
+    rng = np.random.RandomState(seed)
+    X = rng.randn(n_images, n_channels, 9, 10)
+    y = rng.randn(1, 5, 6)
+    return X, y
+
+
+def reference_mccf(X, y, l=0.01):
+    # direct per-image formulation of the MCCF with sparse diagonal matrices
+    n, k, hx, wx = X.shape
+    _, hy, wy = y.shape
+    ext_shape = (hx + hy - 1, wx + wy - 1)
+    ext_d = ext_shape[0] * ext_shape[1]
+    fft_ext_y = fft2(pad(y, ext_shape)).ravel()
+    sXX = 0
+    sXY = 0
+    for x in X:
+        fft_ext_x = fft2(pad(x, ext_shape))
+        diag_fft_x = spdiags(fft_ext_x.reshape((k, -1)),
+                             -np.arange(0, k) * ext_d, ext_d * k, ext_d).T
+        sXX += diag_fft_x.conj().T.dot(diag_fft_x)
+        sXY += diag_fft_x.conj().T.dot(fft_ext_y)
+    fft_ext_f = spsolve(sXX + l * speye(sXX.shape[-1]), sXY)
+    fft_ext_f = fft_ext_f.reshape((k,) + ext_shape)
+    f = np.real(ifftshift(ifft2(fft_ext_f), axes=(-2, -1)))
+    return crop(f, (hy, wy)), sXY, sXX
+
+
+def reference_mosse(X, y, l=0.01):
+    # direct per-image formulation of the MOSSE filter
+    _, _, hx, wx = X.shape
+    _, hy, wy = y.shape
+    ext_shape = (hx + hy - 1, wx + wy - 1)
+    fft_ext_y = fft2(pad(y, ext_shape))
+    sXX = 0
+    sXY = 0
+    for x in X:
+        fft_ext_x = fft2(pad(x, ext_shape))
+        sXX += fft_ext_x.conj() * fft_ext_x
+        sXY += fft_ext_x.conj() * fft_ext_y
+    f = np.real(ifftshift(ifft2(sXY / (sXX + l)), axes=(-2, -1)))
+    return crop(f, (hy, wy)), sXY, sXX
+
+
+def test_mccf():
+    X, y = random_problem()
+    f, sXY, sXX = mccf(X, y)
+    f_ref, sXY_ref, sXX_ref = reference_mccf(X, y)
+    assert_allclose(f, f_ref, atol=1e-10)
+    assert_allclose(sXY, sXY_ref, atol=1e-10)
+    assert_allclose(sXX.toarray(), sXX_ref.toarray(), atol=1e-10)
+
+
+def test_mccf_single_channel():
+    X, y = random_problem(n_channels=1)
+    f, sXY, sXX = mccf(X, y)
+    f_ref, sXY_ref, sXX_ref = reference_mccf(X, y)
+    assert_allclose(f, f_ref, atol=1e-10)
+    assert_allclose(sXY, sXY_ref, atol=1e-10)
+    assert_allclose(sXX.toarray(), sXX_ref.toarray(), atol=1e-10)
+
+
+def test_mosse():
+    X, y = random_problem()
+    f, sXY, sXX = mosse(X, y)
+    f_ref, sXY_ref, sXX_ref = reference_mosse(X, y)
+    assert_allclose(f, f_ref, atol=1e-10)
+    assert_allclose(sXY, sXY_ref, atol=1e-10)
+    assert_allclose(sXX, sXX_ref, atol=1e-10)
+
+
+def test_blocks_sparse_round_trip():
+    rng = np.random.RandomState(0)
+    k, ext_d = 3, 20
+    blocks = rng.randn(k, k, ext_d) + 1j * rng.randn(k, k, ext_d)
+    sXX = _blocks_to_sparse(blocks)
+    assert sXX.shape == (k * ext_d, k * ext_d)
+    assert_allclose(_sparse_to_blocks(sXX, k), blocks)
+
+
+# The incremental filters combine the old and new spectral energies as
+# nu_ab * A + nu_x * S_new, with nu_ab = n_ab / n and nu_x = n_x / n. With
+# f=1.0 and equally sized batches this is exactly half the spectral energy
+# of the concatenated images, hence the filter equals the one trained on the
+# concatenated images with twice the regularization.
+
+def test_imccf():
+    X1, y = random_problem(n_images=4, seed=0)
+    X2, _ = random_problem(n_images=4, seed=1)
+    _, sXY_1, sXX_1 = mccf(X1, y)
+    f, sXY, sXX = imccf(sXY_1, sXX_1, 4, X2, y, l=0.01, f=1.0)
+    f_ref, sXY_ref, sXX_ref = mccf(np.concatenate([X1, X2]), y, l=0.02)
+    assert_allclose(f, f_ref, atol=1e-10)
+    assert_allclose(2 * sXY, sXY_ref, atol=1e-10)
+    assert_allclose(2 * sXX.toarray(), sXX_ref.toarray(), atol=1e-10)
+
+
+def test_imosse():
+    X1, y = random_problem(n_images=4, seed=0)
+    X2, _ = random_problem(n_images=4, seed=1)
+    _, sXY_1, sXX_1 = mosse(X1, y)
+    f, sXY, sXX = imosse(sXY_1, sXX_1, 4, X2, y, l=0.01, f=1.0)
+    f_ref, sXY_ref, sXX_ref = mosse(np.concatenate([X1, X2]), y, l=0.02)
+    assert_allclose(f, f_ref, atol=1e-10)
+    assert_allclose(2 * sXY, sXY_ref, atol=1e-10)
+    assert_allclose(2 * sXX, sXX_ref, atol=1e-10)
+
+
+def test_imccf_matches_reference_update():
+    X1, y = random_problem(n_images=5, seed=0)
+    X2, _ = random_problem(n_images=2, seed=1)
+    _, sXY_1, sXX_1 = reference_mccf(X1, y)
+    f, sXY, sXX = imccf(sXY_1, sXX_1, 5, X2, y)
+    _, sXY_2, sXX_2 = reference_mccf(X2, y)
+    sXY_ref = 5. / 7 * sXY_1 + 2. / 7 * sXY_2
+    sXX_ref = 5. / 7 * sXX_1 + 2. / 7 * sXX_2
+    assert_allclose(sXY, sXY_ref, atol=1e-10)
+    assert_allclose(sXX.toarray(), sXX_ref.toarray(), atol=1e-10)
+
+
+def test_fft_ext_response_cache_hit():
+    cf._fft_ext_y_cache.clear()
+    _, y = random_problem()
+    fft_ext_y = cf._fft_ext_response(y, (13, 15))
+    assert not fft_ext_y.flags.writeable
+    assert_allclose(fft_ext_y, fft2(pad(y, (13, 15))))
+    # an equal (but distinct) response hits the cache
+    assert cf._fft_ext_response(y.copy(), (13, 15)) is fft_ext_y
+    assert len(cf._fft_ext_y_cache) == 1
+
+
+def test_fft_ext_response_cache_miss_different_contents():
+    cf._fft_ext_y_cache.clear()
+    _, y = random_problem()
+    fft_ext_y = cf._fft_ext_response(y, (13, 15))
+    y_2 = y.copy()
+    y_2[0, 0, 0] += 1
+    fft_ext_y_2 = cf._fft_ext_response(y_2, (13, 15))
+    assert fft_ext_y_2 is not fft_ext_y
+    assert_allclose(fft_ext_y_2, fft2(pad(y_2, (13, 15))))
+    assert len(cf._fft_ext_y_cache) == 2
+
+
+def test_fft_ext_response_cache_miss_different_ext_shape():
+    cf._fft_ext_y_cache.clear()
+    _, y = random_problem()
+    fft_ext_y = cf._fft_ext_response(y, (13, 15))
+    fft_ext_y_2 = cf._fft_ext_response(y, (14, 16))
+    assert fft_ext_y_2 is not fft_ext_y
+    assert fft_ext_y_2.shape == (1, 14, 16)
+    assert_allclose(fft_ext_y_2, fft2(pad(y, (14, 16))))
+
+
+def test_fft_ext_response_cache_cleared_when_full():
+    cf._fft_ext_y_cache.clear()
+    _, y = random_problem()
+    for i in range(cf._FFT_EXT_Y_CACHE_SIZE):
+        cf._fft_ext_response(y + i, (13, 15))
+    assert len(cf._fft_ext_y_cache) == cf._FFT_EXT_Y_CACHE_SIZE
+    fft_ext_y = cf._fft_ext_response(y - 1, (13, 15))
+    assert len(cf._fft_ext_y_cache) == 1
+    assert_allclose(fft_ext_y, fft2(pad(y - 1, (13, 15))))